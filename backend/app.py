@@ -1,13 +1,20 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
 import pandas as pd
 import json
 import uuid
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 from excel_reader_for_llm import read_excel_for_llm, excel_to_json
 from chart_generation_multiple import ProcessDataExtractor, ChartGenerator
+from cell_index import (build_cell_index, manifest_path, tile_path, find_sheet,
+                        tiles_for_window, select_window, MAX_WINDOW_ROWS, MAX_WINDOW_COLUMNS)
+from request_profiler import RequestProfiler
 from supabase import create_client, Client
 
 load_dotenv()
@@ -17,13 +24,42 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
 
+class StorageError(Exception):
+    """Raised when a Supabase storage call returns an error response"""
+
+# Number of concurrent storage calls used when writing or reading cell tiles
+INDEX_WORKERS = 8
+
 app = Flask(__name__)
 CORS(app)
 
+# Opt-in request profiling: disabled unless PROFILING_TOKEN is set
+profiler = RequestProfiler(
+    app,
+    output_dir=os.getenv('PROFILING_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')),
+    token=os.getenv('PROFILING_TOKEN'),
+    sample_rate=float(os.getenv('PROFILING_SAMPLE_RATE', '0')),
+    max_profiles=int(os.getenv('PROFILING_MAX_PROFILES', '50'))
+)
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy"}), 200
 
+@app.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    if not profiler.is_authorized():
+        return jsonify({"error": "Not found"}), 404
+    return jsonify({"profiles": profiler.list_profiles()}), 200
+
+@app.route('/api/profiles/<filename>', methods=['GET'])
+def download_profile(filename):
+    if not profiler.is_authorized():
+        return jsonify({"error": "Not found"}), 404
+    if not filename.endswith(('.prof', '.json')):
+        return jsonify({"error": "Invalid profile file"}), 400
+    return send_from_directory(profiler.output_dir, filename, as_attachment=True)
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     if 'file' not in request.files:
@@ -60,7 +96,8 @@ def upload_file():
         
         try:
             # Process the Excel file
-            json_data = read_excel_for_llm(temp_filepath)
+            with profiler.stage('parse'):
+                json_data = read_excel_for_llm(temp_filepath)
         finally:
             # Clean up temp file
             if os.path.exists(temp_filepath):
@@ -78,6 +115,12 @@ def upload_file():
         if hasattr(json_response, 'error'):
             return jsonify({'error': str(json_response.error)}), 500
         
+        # Store the cells in tiles plus a manifest so consumers can fetch a
+        # window through /api/cells instead of the whole JSON. This runs off
+        # the request path; /api/cells answers 404 until the manifest exists.
+        dataset_id = os.path.splitext(unique_filename)[0]
+        threading.Thread(target=index_cells_in_background, args=(dataset_id, json_data), daemon=True).start()
+        
         # Get the public URL for the JSON file
         json_url = supabase.storage \
             .from_('excel-uploads') \
@@ -85,7 +128,8 @@ def upload_file():
         
         return jsonify({
             "message": "File processed successfully",
-            "json_path": json_url
+            "json_path": json_url,
+            "cells_id": dataset_id
         }), 200
         
     except Exception as e:
@@ -94,6 +138,153 @@ def upload_file():
         print(traceback.format_exc())
         return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
 
+def upload_index_object(path, content):
+    """Upload a manifest or tile to the excel-uploads bucket"""
+    response = supabase.storage \
+        .from_('excel-uploads') \
+        .upload(path, json.dumps(content, ensure_ascii=False).encode('utf-8'))
+    
+    if hasattr(response, 'error'):
+        raise StorageError(str(response.error))
+
+def upload_cell_index(dataset_id, json_data):
+    """Upload the tiled cell layout of a processed workbook"""
+    manifest, tiles = build_cell_index(dataset_id, json_data)
+    
+    # Tiles are independent, so upload them concurrently
+    with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as executor:
+        futures = [executor.submit(upload_index_object, path, tile) for path, tile in tiles.items()]
+        for future in futures:
+            future.result()
+    
+    # Manifest goes last so a readable manifest implies all tiles exist
+    upload_index_object(manifest_path(dataset_id), manifest)
+
+def index_cells_in_background(dataset_id, json_data):
+    """Build and upload the cell index off the request path; failures are logged, not returned"""
+    try:
+        upload_cell_index(dataset_id, json_data)
+    except Exception:
+        import traceback
+        print(f"Error indexing cells for {dataset_id}:")
+        print(traceback.format_exc())
+
+def load_index_object(path):
+    """Download a manifest or tile from the excel-uploads bucket"""
+    content = supabase.storage \
+        .from_('excel-uploads') \
+        .download(path)
+    return json.loads(content)
+
+@lru_cache(maxsize=256)
+def load_manifest(dataset_id):
+    """Download a workbook manifest; manifests are small and never rewritten, so they are cached"""
+    return load_index_object(manifest_path(dataset_id))
+
+def is_missing_object(error):
+    """Whether a storage download failed because the object does not exist"""
+    details = error.args[0] if error.args and isinstance(error.args[0], dict) else {}
+    return (str(details.get('statusCode')) == '404'
+            or details.get('error') == 'not_found'
+            or 'not found' in str(details.get('message', error)).lower())
+
+def int_arg(name, default):
+    """Read an integer query parameter, raising ValueError on malformed input"""
+    value = request.args.get(name)
+    return default if value is None else int(value)
+
+@app.route('/api/cells', methods=['GET'])
+def get_cells():
+    dataset_id = request.args.get('id', '')
+    sheet_name = request.args.get('sheet')
+    # Tile paths live under a fixed prefix, so only '/' could escape it
+    if not dataset_id or '/' in dataset_id:
+        return jsonify({"error": "Invalid or missing id"}), 400
+    if not sheet_name:
+        return jsonify({"error": "No sheet provided"}), 400
+    
+    try:
+        row_start = int_arg('row_start', 1)
+        row_count = int_arg('row_count', 100)
+        col_start = int_arg('col_start', 1)
+        col_count = int_arg('col_count', MAX_WINDOW_COLUMNS)
+    except ValueError:
+        return jsonify({"error": "Window bounds must be integers"}), 400
+    if row_start < 1 or col_start < 1 or row_count < 1 or col_count < 1:
+        return jsonify({"error": "Window bounds must be positive integers"}), 400
+    
+    # Cap the window so the payload size does not grow with the workbook
+    row_count = min(row_count, MAX_WINDOW_ROWS)
+    col_count = min(col_count, MAX_WINDOW_COLUMNS)
+    
+    try:
+        try:
+            manifest = load_manifest(dataset_id)
+        except Exception as e:
+            if not is_missing_object(e):
+                raise
+            return jsonify({"error": "Processed workbook not found or still being indexed"}), 404
+        
+        sheet = find_sheet(manifest, sheet_name)
+        if sheet is None:
+            return jsonify({"error": f"Sheet not found: {sheet_name}"}), 404
+        
+        row_end = min(row_start + row_count - 1, sheet['max_row'])
+        col_end = min(col_start + col_count - 1, sheet['max_column'])
+        
+        cells = []
+        if row_start <= row_end and col_start <= col_end:
+            paths = [tile_path(dataset_id, sheet['index'], row_block, col_block)
+                     for row_block, col_block in tiles_for_window(manifest, sheet, row_start, row_end, col_start, col_end)]
+            with ThreadPoolExecutor(max_workers=INDEX_WORKERS) as executor:
+                tiles = list(executor.map(load_index_object, paths))
+            cells = select_window(tiles, row_start, row_end, col_start, col_end)
+        
+        return jsonify({
+            "sheet_name": sheet_name,
+            "max_row": sheet['max_row'],
+            "max_column": sheet['max_column'],
+            "row_start": row_start,
+            "row_end": row_end,
+            "col_start": col_start,
+            "col_end": col_end,
+            "cells": cells,
+            "next_row_start": row_end + 1 if row_end < sheet['max_row'] else None
+        }), 200
+        
+    except Exception as e:
+        import traceback
+        print("Error in get_cells:")
+        print(traceback.format_exc())
+        return jsonify({"error": str(e), "traceback": traceback.format_exc()}), 500
+
+def chart_public_url(unique_filename):
+    """Public URL of a chart in the charts-output bucket (formatted locally, no request)"""
+    return supabase.storage \
+        .from_('charts-output') \
+        .get_public_url(unique_filename)
+
+def upload_charts(charts):
+    """Upload rendered charts to the charts-output bucket under their unique filenames"""
+    for unique_filename, chart_data in charts:
+        # Upload chart to Supabase
+        response = supabase.storage \
+            .from_('charts-output') \
+            .upload(unique_filename, chart_data)
+            
+        if hasattr(response, 'error'):
+            raise StorageError(str(response.error))
+
+def persist_charts_in_background(charts):
+    """Upload charts off the request path; failures are logged, not returned"""
+    try:
+        upload_charts(charts)
+        print(f"Persisted {len(charts)} charts: {', '.join(name for name, _ in charts)}")
+    except Exception:
+        import traceback
+        print(f"Error persisting charts in background: {', '.join(name for name, _ in charts)}")
+        print(traceback.format_exc())
+
 @app.route('/api/generate-charts', methods=['POST'])
 def generate_charts():
     try:
@@ -103,80 +294,83 @@ def generate_charts():
         
         json_files = data['files']
         scenario_names = data.get('scenarios', [f"Scenario {i+1}" for i in range(len(json_files))])
+        # Direct mode returns base64 chart bytes in the response; storage upload
+        # then only happens in the background when 'persist' is requested
+        direct = data.get('direct') is True
+        persist = data.get('persist') is True
         
         # Create chart generator
         chart_gen = ChartGenerator()
         
         # Process each file
-        processes = []
-        for json_url, scenario_name in zip(json_files, scenario_names):
-            extractor = ProcessDataExtractor(json_url, scenario_name)
-            process_data = extractor.extract_process_data()
-            processes.append(process_data)
-        
-        # Generate charts
-        chart_urls = []
-        
-        # Generate comparative charts
-        categories = {
-            'Operating Costs': (lambda p: p.operating_costs, 'AOC.png'),
-            'Material Costs': (lambda p: p.material_costs, 'Materials.png'),
-            'Consumable Costs': (lambda p: p.consumable_costs, 'Consumables.png'),
-            'Utility Costs': (lambda p: p.utility_costs, 'Utilities.png')
-        }
-        
-        for title, (getter, filename) in categories.items():
-            data = {p.name: getter(p) for p in processes}
-            chart_bytes = BytesIO()
-            chart_gen.create_comparative_chart(
-                data,
-                f'Comparative {title}',
-                f'Annual Cost ({processes[0].currency})',
-                chart_bytes,
-                format='png'
-            )
-            chart_bytes.seek(0)
-            
-            # Generate unique filename
-            unique_filename = f"chart_{str(uuid.uuid4())}_{filename}"
-            
-            # Upload chart to Supabase
-            response = supabase.storage \
-            .from_('charts-output') \
-                .upload(unique_filename, chart_bytes.read())
-                
-            if hasattr(response, 'error'):
-                return jsonify({'error': str(response.error)}), 500
-                
-            # Get public URL
-            chart_url = supabase.storage \
-            .from_('charts-output') \
-                .get_public_url(unique_filename)
-            chart_urls.append(chart_url)
+        with profiler.stage('extract'):
+            processes = []
+            for json_url, scenario_name in zip(json_files, scenario_names):
+                extractor = ProcessDataExtractor(json_url, scenario_name)
+                process_data = extractor.extract_process_data()
+                processes.append(process_data)
         
-        # Generate stacked bar chart
-        stacked_chart_bytes = BytesIO()
-        chart_gen.create_stacked_bar_chart(processes, stacked_chart_bytes, format='png')
-        stacked_chart_bytes.seek(0)
+        # Render all charts in memory before touching storage
+        with profiler.stage('render'):
+            charts = []
         
-        # Upload stacked bar chart
-        stacked_filename = f"chart_{str(uuid.uuid4())}_stacked_bar_chart.png"
-        response = supabase.storage \
-            .from_('charts-output') \
-            .upload(stacked_filename, stacked_chart_bytes.read())
+            # Generate comparative charts
+            categories = {
+                'Operating Costs': (lambda p: p.operating_costs, 'AOC.png'),
+                'Material Costs': (lambda p: p.material_costs, 'Materials.png'),
+                'Consumable Costs': (lambda p: p.consumable_costs, 'Consumables.png'),
+                'Utility Costs': (lambda p: p.utility_costs, 'Utilities.png')
+            }
+        
+            for title, (getter, filename) in categories.items():
+                data = {p.name: getter(p) for p in processes}
+                chart_bytes = BytesIO()
+                chart_gen.create_comparative_chart(
+                    data,
+                    f'Comparative {title}',
+                    f'Annual Cost ({processes[0].currency})',
+                    chart_bytes,
+                    format='png'
+                )
+                charts.append((filename, chart_bytes.getvalue()))
+        
+            # Generate stacked bar chart
+            stacked_chart_bytes = BytesIO()
+            chart_gen.create_stacked_bar_chart(processes, stacked_chart_bytes, format='png')
+            charts.append(('stacked_bar_chart.png', stacked_chart_bytes.getvalue()))
+        
+        # Generate unique filenames up front so persisted charts can be referenced
+        named_charts = [(f"chart_{str(uuid.uuid4())}_{filename}", chart_data)
+                        for filename, chart_data in charts]
+        
+        if direct:
+            # Return the rendered charts inline so the client can display them
+            # without any storage round trips
+            response_data = {
+                "message": "Charts generated successfully",
+                "charts": [{
+                    "filename": filename,
+                    "content_type": "image/png",
+                    "data": base64.b64encode(chart_data).decode('ascii')
+                } for filename, chart_data in charts]
+            }
             
-        if hasattr(response, 'error'):
-            return jsonify({'error': str(response.error)}), 500
+            if persist:
+                # The URLs are reserved up front and only resolve once the
+                # background upload has finished; failed uploads are logged
+                threading.Thread(target=persist_charts_in_background, args=(named_charts,), daemon=True).start()
+                response_data["persisted_urls"] = [chart_public_url(name) for name, _ in named_charts]
             
-        # Get public URL for stacked chart
-        stacked_url = supabase.storage \
-            .from_('charts-output') \
-            .get_public_url(stacked_filename)
-        chart_urls.append(stacked_url)
+            return jsonify(response_data), 200
+        
+        try:
+            upload_charts(named_charts)
+        except StorageError as e:
+            return jsonify({'error': str(e)}), 500
         
         return jsonify({
             "message": "Charts generated successfully",
-            "chart_urls": chart_urls
+            "chart_urls": [chart_public_url(name) for name, _ in named_charts]
         }), 200
         
     except Exception as e:
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import contextlib
+from io import BytesIO, StringIO
+from excel_reader_for_llm import detect_excel_format, available_engines, read_excel_sheets
+
+def benchmark_file(file_path: str, repeat: int = 5):
+    """
+    Time a full parse of every sheet with each installed engine for the file's format
+
+    Args:
+        file_path: Path to an .xls or .xlsx file
+        repeat: Number of timed parses per engine
+
+    Returns:
+        List of result dictionaries, one per engine
+    """
+    with open(file_path, 'rb') as f:
+        file_bytes = f.read()
+
+    excel_format = detect_excel_format(BytesIO(file_bytes))
+    if excel_format is None:
+        raise Exception(f"Invalid Excel file format: {file_path}")
+
+    size_mb = len(file_bytes) / (1024 * 1024)
+    results = []
+
+    for engine in available_engines(excel_format):
+        timings = []
+        cells = 0
+        try:
+            for _ in range(repeat):
+                # Silence the reader's progress logging while timing
+                with contextlib.redirect_stdout(StringIO()):
+                    start = time.perf_counter()
+                    sheets = read_excel_sheets(BytesIO(file_bytes), excel_format, engines=[engine])
+                    timings.append(time.perf_counter() - start)
+                cells = sum(df.size for df in sheets.values())
+        except Exception as e:
+            results.append({"engine": engine, "format": excel_format, "error": str(e)})
+            continue
+
+        best = min(timings)
+        results.append({
+            "engine": engine,
+            "format": excel_format,
+            "best_seconds": best,
+            "mean_seconds": sum(timings) / len(timings),
+            "mb_per_second": size_mb / best if best else 0.0,
+            "cells_per_second": cells / best if best else 0.0
+        })
+
+    return results
+
+def main(file_paths, repeat: int = 5):
+    """Print parse throughput per engine for each file"""
+    print(f"{'file':<40} {'format':<6} {'engine':<10} {'best [s]':>10} {'mean [s]':>10} {'MB/s':>8} {'cells/s':>12}")
+    for file_path in file_paths:
+        name = os.path.basename(file_path)
+        for result in benchmark_file(file_path, repeat):
+            if 'error' in result:
+                print(f"{name:<40} {result['format']:<6} {result['engine']:<10} failed: {result['error']}")
+                continue
+            print(f"{name:<40} {result['format']:<6} {result['engine']:<10} "
+                  f"{result['best_seconds']:>10.4f} {result['mean_seconds']:>10.4f} "
+                  f"{result['mb_per_second']:>8.2f} {result['cells_per_second']:>12.0f}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = 5
+    if len(args) >= 2 and args[0] == '--repeat':
+        repeat = int(args[1])
+        args = args[2:]
+
+    if not args:
+        print("Usage: python benchmark_excel_engines.py [--repeat N] <excel_file> [excel_file ...]")
+        sys.exit(1)
+
+    main(args, repeat)
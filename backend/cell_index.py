@@ -0,0 +1,94 @@
+from typing import Dict, List, Optional, Tuple, Any
+
+# Size of the row x column tiles the cells of each sheet are stored in
+TILE_ROWS = 500
+TILE_COLUMNS = 50
+
+# Largest window a single range request may return
+MAX_WINDOW_ROWS = 500
+MAX_WINDOW_COLUMNS = 100
+
+def index_prefix(dataset_id: str) -> str:
+    """Storage folder holding the manifest and tiles of a processed workbook"""
+    return f"{dataset_id}_cells"
+
+def manifest_path(dataset_id: str) -> str:
+    """Storage path of the manifest for a processed workbook"""
+    return f"{index_prefix(dataset_id)}/manifest.json"
+
+def tile_path(dataset_id: str, sheet_index: int, row_block: int, col_block: int) -> str:
+    """Storage path of one tile; sheets are addressed by position to keep paths safe"""
+    return f"{index_prefix(dataset_id)}/{sheet_index}/{row_block}_{col_block}.json"
+
+def build_cell_index(dataset_id: str,
+                     json_data: Dict[str, Dict],
+                     tile_rows: int = TILE_ROWS,
+                     tile_columns: int = TILE_COLUMNS) -> Tuple[Dict, Dict[str, Dict]]:
+    """
+    Split the output of read_excel_for_llm into fixed-size row x column tiles
+
+    Only tiles that contain cells are stored; the manifest lists them per sheet.
+
+    Args:
+        dataset_id: Identifier of the processed workbook (uploaded file name without extension)
+        json_data: Dictionary of sheets as returned by read_excel_for_llm
+        tile_rows: Number of worksheet rows per tile
+        tile_columns: Number of worksheet columns per tile
+
+    Returns:
+        Tuple of (manifest, tiles) where tiles maps storage paths to tile contents
+    """
+    manifest = {"tile_rows": tile_rows, "tile_columns": tile_columns, "sheets": []}
+    tiles = {}
+
+    for sheet_index, (sheet_name, sheet) in enumerate(json_data.items()):
+        sheet_tiles = {}
+        for cell in sheet["cells"]:
+            key = ((cell["row"] - 1) // tile_rows, (cell["column"] - 1) // tile_columns)
+            sheet_tiles.setdefault(key, []).append(cell)
+
+        manifest["sheets"].append({
+            "sheet_name": sheet_name,
+            "index": sheet_index,
+            "max_row": sheet["max_row"],
+            "max_column": sheet["max_column"],
+            "tiles": sorted([row_block, col_block] for row_block, col_block in sheet_tiles)
+        })
+
+        for (row_block, col_block), cells in sheet_tiles.items():
+            tiles[tile_path(dataset_id, sheet_index, row_block, col_block)] = {
+                "sheet_name": sheet_name,
+                "row_start": row_block * tile_rows + 1,
+                "row_end": (row_block + 1) * tile_rows,
+                "col_start": col_block * tile_columns + 1,
+                "col_end": (col_block + 1) * tile_columns,
+                "cells": cells
+            }
+
+    return manifest, tiles
+
+def find_sheet(manifest: Dict, sheet_name: str) -> Optional[Dict]:
+    """Return the manifest entry for a sheet, or None if the workbook has no such sheet"""
+    return next((s for s in manifest["sheets"] if s["sheet_name"] == sheet_name), None)
+
+def tiles_for_window(manifest: Dict, sheet: Dict, row_start: int, row_end: int, col_start: int, col_end: int) -> List[Tuple[int, int]]:
+    """Return the (row_block, col_block) of the stored tiles overlapping the window (1-based, inclusive)"""
+    tile_rows = manifest["tile_rows"]
+    tile_columns = manifest["tile_columns"]
+    stored = {tuple(tile) for tile in sheet["tiles"]}
+    return [
+        (row_block, col_block)
+        for row_block in range((row_start - 1) // tile_rows, (row_end - 1) // tile_rows + 1)
+        for col_block in range((col_start - 1) // tile_columns, (col_end - 1) // tile_columns + 1)
+        if (row_block, col_block) in stored
+    ]
+
+def select_window(tiles: List[Dict], row_start: int, row_end: int, col_start: int, col_end: int) -> List[Dict[str, Any]]:
+    """Return the cells of the given tiles inside the window, ordered by row then column"""
+    cells = [
+        cell
+        for tile in tiles
+        for cell in tile["cells"]
+        if row_start <= cell["row"] <= row_end and col_start <= cell["column"] <= col_end
+    ]
+    return sorted(cells, key=lambda cell: (cell["row"], cell["column"]))
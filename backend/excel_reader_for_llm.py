@@ -2,12 +2,97 @@ import pandas as pd
 import json
 import sys
 import os
+import importlib.util
 from openpyxl import load_workbook
 
+# Magic bytes identifying each supported Excel container format
+EXCEL_SIGNATURES = {
+    'xlsx': b'PK\x03\x04',        # Office Open XML (zip container)
+    'xls': b'\xD0\xCF\x11\xE0',   # Legacy BIFF (OLE2 compound document)
+}
+
+# pandas engines to try for each format, in order of preference.
+# Engines whose backing package is not installed are skipped.
+EXCEL_ENGINES = {
+    'xlsx': ['calamine', 'openpyxl'],
+    'xls': ['calamine', 'xlrd'],
+}
+
+# Package that has to be importable for each engine to be usable
+ENGINE_MODULES = {
+    'calamine': 'python_calamine',
+    'openpyxl': 'openpyxl',
+    'xlrd': 'xlrd',
+}
+
+def detect_excel_format(file_input):
+    """
+    Detect the Excel format from the leading magic bytes
+    
+    Args:
+        file_input: Either a string file path or BytesIO object containing Excel data
+    
+    Returns:
+        'xlsx', 'xls' or None if the signature is not recognised
+    """
+    if isinstance(file_input, str):
+        with open(file_input, 'rb') as f:
+            magic_bytes = f.read(8)
+    else:
+        position = file_input.tell()
+        file_input.seek(0)
+        magic_bytes = file_input.read(8)
+        file_input.seek(position)  # Reset position after reading magic bytes
+    
+    for excel_format, signature in EXCEL_SIGNATURES.items():
+        if magic_bytes.startswith(signature):
+            return excel_format
+    return None
+
+def available_engines(excel_format):
+    """Return the installed pandas engines able to parse the given format, in preference order"""
+    return [engine for engine in EXCEL_ENGINES.get(excel_format, [])
+            if importlib.util.find_spec(ENGINE_MODULES[engine]) is not None]
+
+def read_excel_sheets(file_input, excel_format, engines=None):
+    """
+    Read all sheets with the first engine that succeeds
+    
+    Args:
+        file_input: Either a string file path or BytesIO object containing Excel data
+        excel_format: 'xlsx' or 'xls', as returned by detect_excel_format
+        engines: Optional list of engines to try instead of the defaults for the format
+    
+    Returns:
+        Dictionary mapping sheet names to DataFrames
+    """
+    if engines is None:
+        engines = available_engines(excel_format)
+    if not engines:
+        raise Exception(f"No Excel engine installed for .{excel_format} files")
+    
+    errors = []
+    for engine in engines:
+        print(f"Attempting to read with {engine} engine")
+        try:
+            if not isinstance(file_input, str):
+                file_input.seek(0)  # Rewind the stream left by a previous attempt
+            sheets = pd.read_excel(file_input, sheet_name=None, engine=engine)
+            print(f"Successfully read .{excel_format} file with {engine} engine")
+            return sheets
+        except Exception as e:
+            print(f"{engine} engine failed: {str(e)}")
+            errors.append(f"{engine} error: {str(e)}")
+    
+    raise Exception(f"Failed to read Excel file. {', '.join(errors)}")
+
 def read_excel_for_llm(file_input):
     """
     Read Excel file from either a file path or BytesIO object
     
+    The parsing engine is chosen from the file's magic bytes, so .xls data
+    goes straight to an engine that can read it.
+    
     Args:
         file_input: Either a string file path or BytesIO object containing Excel data
     """
@@ -19,85 +104,59 @@ def read_excel_for_llm(file_input):
             file_path = file_input
             _, ext = os.path.splitext(file_path)
             print(f"Reading from file path: {file_path}")
+            if ext.lower() not in ['.xlsx', '.xls']:
+                print(f"Unsupported file format: {ext}")
+                return None
         else:
-            # For BytesIO, we need to handle it differently since it's a stream
             file_path = file_input
             print("Reading from BytesIO object")
-            # Try to read the first few bytes to check if it's an Excel file
-            magic_bytes = file_path.read(8)
-            file_path.seek(0)  # Reset position after reading magic bytes
-            
-            # Check magic bytes for Excel file types
-            if magic_bytes.startswith(b'PK\x03\x04'):  # XLSX file
-                ext = '.xlsx'
-            elif magic_bytes.startswith(b'\xD0\xCF\x11\xE0'):  # XLS file
-                ext = '.xls'
-            else:
-                raise Exception("Invalid Excel file format")
         
-        if ext.lower() in ['.xlsx', '.xls']:
-            sheets = {}
-            
-            # Try openpyxl first for all Excel files
-            print("Attempting to read with openpyxl engine")
-            try:
-                sheets = pd.read_excel(file_path, sheet_name=None, engine='openpyxl')
-                print("Successfully read with openpyxl engine")
-            except Exception as e:
-                print(f"openpyxl engine failed: {str(e)}")
-                if isinstance(file_input, str) and ext.lower() == '.xls':
-                    # Fallback to xlrd only for .xls files from file path
-                    print("Attempting fallback to xlrd engine for .xls file")
-                    try:
-                        sheets = pd.read_excel(file_path, sheet_name=None, engine='xlrd')
-                        print("Successfully read .xls file with xlrd engine")
-                    except Exception as e2:
-                        print(f"xlrd engine also failed: {str(e2)}")
-                        raise Exception(f"Failed to read Excel file. openpyxl error: {str(e)}, xlrd error: {str(e2)}")
-                else:
-                    raise Exception(f"Failed to read Excel file: {str(e)}")
-            
-            print(f"Successfully read the Excel file: {file_path}")
+        # Check magic bytes for Excel file types
+        excel_format = detect_excel_format(file_input)
+        if excel_format is None:
+            raise Exception("Invalid Excel file format")
+        print(f"Detected .{excel_format} content")
+        
+        sheets = read_excel_sheets(file_input, excel_format)
+        
+        print(f"Successfully read the Excel file: {file_path}")
+        
+        file_data = {}
+        
+        for sheet_name, df in sheets.items():
+            print(f"Processing sheet: {sheet_name}")
             
-            file_data = {}
+            # Prepare the data structure
+            data = {
+                "sheet_name": sheet_name,
+                "max_row": df.shape[0],
+                "max_column": df.shape[1],
+                "cells": []
+            }
             
-            for sheet_name, df in sheets.items():
-                print(f"Processing sheet: {sheet_name}")
-                
-                # Prepare the data structure
-                data = {
-                    "sheet_name": sheet_name,
-                    "max_row": df.shape[0],
-                    "max_column": df.shape[1],
-                    "cells": []
-                }
-                
-                # Iterate through the dataframe
-                for row in range(df.shape[0]):
-                    for col in range(df.shape[1]):
-                        value = df.iat[row, col]
-                        if pd.notna(value):  # Check if the cell is not empty
-                            # Convert value to string with error handling
-                            try:
-                                str_value = str(value)
-                            except UnicodeEncodeError:
-                                str_value = str(value).encode('ascii', 'replace').decode('ascii')
-                            
-                            cell_data = {
-                                "row": row + 1,  # Adding 1 to match Excel's 1-based indexing
-                                "column": col + 1,
-                                "column_letter": chr(65 + col % 26),  # Convert column number to letter (A, B, C, etc.)
-                                "value": str_value
-                            }
-                            data["cells"].append(cell_data)
-                
-                file_data[sheet_name] = data
-                print(f"Processed {len(data['cells'])} non-empty cells in sheet {sheet_name}")
+            # Iterate through the dataframe
+            for row in range(df.shape[0]):
+                for col in range(df.shape[1]):
+                    value = df.iat[row, col]
+                    if pd.notna(value):  # Check if the cell is not empty
+                        # Convert value to string with error handling
+                        try:
+                            str_value = str(value)
+                        except UnicodeEncodeError:
+                            str_value = str(value).encode('ascii', 'replace').decode('ascii')
+                        
+                        cell_data = {
+                            "row": row + 1,  # Adding 1 to match Excel's 1-based indexing
+                            "column": col + 1,
+                            "column_letter": chr(65 + col % 26),  # Convert column number to letter (A, B, C, etc.)
+                            "value": str_value
+                        }
+                        data["cells"].append(cell_data)
             
-            return file_data
-        else:
-            print(f"Unsupported file format: {ext}")
-            return None
+            file_data[sheet_name] = data
+            print(f"Processed {len(data['cells'])} non-empty cells in sheet {sheet_name}")
+        
+        return file_data
     
     except Exception as e:
         print(f"Error reading Excel file {file_path}: {str(e)}")
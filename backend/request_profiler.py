@@ -0,0 +1,172 @@
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Optional
+from flask import Flask, g, request
+
+class RequestProfiler:
+    """Opt-in CPU and peak-memory profiling of selected Flask requests
+
+    Profiling is disabled unless a token is configured. A request is profiled
+    when it sends the token in the X-Profile-Token header, or when it is picked
+    by random sampling at sample_rate. Each profile is saved as a cProfile
+    .prof file plus a .json summary with the request's tracemalloc peak and,
+    for every stage() block the request ran, that stage's duration, peak
+    memory and the allocations still alive when it ended. Only the newest
+    max_profiles profiles are kept.
+    """
+
+    def __init__(self,
+                 app: Flask,
+                 output_dir: str,
+                 token: Optional[str],
+                 sample_rate: float = 0.0,
+                 max_profiles: int = 50,
+                 endpoints: Iterable[str] = ('upload_file', 'generate_charts')):
+        self.output_dir = output_dir
+        self.token = token or None
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.max_profiles = max(max_profiles, 1)
+        self.endpoints = set(endpoints)
+        # tracemalloc is process-wide, so only one request is profiled at a time
+        self._lock = threading.Lock()
+
+        app.before_request(self._start)
+        app.after_request(self._stop)
+        app.teardown_request(self._release)
+
+    @property
+    def enabled(self) -> bool:
+        return self.token is not None
+
+    def is_authorized(self) -> bool:
+        """Check the X-Profile-Token header against the configured token"""
+        supplied = request.headers.get('X-Profile-Token', '')
+        # Compare as bytes: compare_digest rejects non-ASCII str values
+        return self.enabled and hmac.compare_digest(supplied.encode('utf-8'), self.token.encode('utf-8'))
+
+    def _should_profile(self) -> bool:
+        if not self.enabled or request.endpoint not in self.endpoints:
+            return False
+        return self.is_authorized() or random.random() < self.sample_rate
+
+    def _start(self):
+        if not self._should_profile() or not self._lock.acquire(blocking=False):
+            return
+        g.profile_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}_{request.endpoint}_{uuid.uuid4().hex[:8]}"
+        g.profile_started = time.perf_counter()
+        g.profile_peak = 0
+        g.profile_stages = []
+        tracemalloc.start()
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+    def _stop(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+
+        try:
+            profiler.disable()
+            duration = time.perf_counter() - g.profile_started
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, g.profile_peak)
+            snapshot = tracemalloc.take_snapshot()
+        except Exception as e:
+            print(f"Error capturing request profile {g.profile_id}: {str(e)}")
+            return response
+        finally:
+            tracemalloc.stop()
+            self._lock.release()
+
+        try:
+            self._save(g.profile_id, profiler, snapshot, duration, current, peak, response.status_code)
+            response.headers['X-Profile-Id'] = g.profile_id
+        except Exception as e:
+            print(f"Error saving request profile {g.profile_id}: {str(e)}")
+        return response
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record duration and peak memory of a block when the current request is profiled"""
+        if g.get('profiler') is None:
+            yield
+            return
+
+        # reset_peak makes the peak below belong to this stage only, so fold
+        # the peak reached so far into the request-wide peak first
+        g.profile_peak = max(g.profile_peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            _, peak = tracemalloc.get_traced_memory()
+            g.profile_peak = max(g.profile_peak, peak)
+            # Taken before the stage's locals go out of scope in the caller
+            snapshot = tracemalloc.take_snapshot()
+            g.profile_stages.append({
+                "name": name,
+                "duration_seconds": time.perf_counter() - started,
+                "memory_peak_bytes": peak,
+                "allocations_at_end": [str(stat) for stat in snapshot.statistics('lineno')[:10]]
+            })
+
+    def _release(self, exc):
+        """Clean up if the request ended before after_request ran"""
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            tracemalloc.stop()
+            self._lock.release()
+
+    def _save(self, profile_id, profiler, snapshot, duration, current, peak, status_code):
+        os.makedirs(self.output_dir, exist_ok=True)
+        profiler.dump_stats(os.path.join(self.output_dir, f"{profile_id}.prof"))
+
+        stats_text = io.StringIO()
+        pstats.Stats(profiler, stream=stats_text).sort_stats('cumulative').print_stats(30)
+
+        summary = {
+            "id": profile_id,
+            "endpoint": request.endpoint,
+            "path": request.path,
+            "status_code": status_code,
+            "duration_seconds": duration,
+            "memory_peak_bytes": peak,
+            "memory_current_bytes": current,
+            "stages": g.get('profile_stages', []),
+            # What is still allocated when the response is sent, not what
+            # made up the peak; see the per-stage entries for that
+            "allocations_at_response": [str(stat) for stat in snapshot.statistics('lineno')[:20]],
+            "top_functions": stats_text.getvalue()
+        }
+        with open(os.path.join(self.output_dir, f"{profile_id}.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+        print(f"Saved request profile {profile_id} ({duration:.3f}s, peak {peak / (1024 * 1024):.1f} MiB)")
+        self._prune()
+
+    def _prune(self):
+        """Delete the oldest profiles beyond max_profiles"""
+        for profile_id in self.list_profiles()[self.max_profiles:]:
+            for ext in ('.prof', '.json'):
+                path = os.path.join(self.output_dir, f"{profile_id}{ext}")
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def list_profiles(self):
+        """Return the ids of the saved profiles, newest first (ids start with a timestamp)"""
+        if not os.path.isdir(self.output_dir):
+            return []
+        ids = {os.path.splitext(name)[0] for name in os.listdir(self.output_dir) if name.endswith(('.prof', '.json'))}
+        return sorted(ids, reverse=True)
@@ -0,0 +1,114 @@
+import importlib
+import sys
+import types
+import pytest
+
+class FakeBucket:
+    """In-memory stand-in for a Supabase storage bucket"""
+
+    def __init__(self, objects, bucket):
+        self.objects = objects
+        self.bucket = bucket
+
+    def upload(self, path, content):
+        self.objects[(self.bucket, path)] = content
+        return {"Key": f"{self.bucket}/{path}"}
+
+    def download(self, path):
+        if path.startswith('broken'):
+            raise Exception({'statusCode': 403, 'error': 'Unauthorized', 'message': 'invalid signature'})
+        if (self.bucket, path) not in self.objects:
+            raise Exception({'statusCode': 400, 'error': 'not_found', 'message': 'Object not found'})
+        return self.objects[(self.bucket, path)]
+
+    def get_public_url(self, path):
+        return f"https://storage.test/{self.bucket}/{path}"
+
+class FakeStorage:
+    def __init__(self):
+        self.objects = {}
+
+    def from_(self, bucket):
+        return FakeBucket(self.objects, bucket)
+
+@pytest.fixture
+def app_module(monkeypatch):
+    """Import app against a stubbed supabase client"""
+    fake_client = types.SimpleNamespace(storage=FakeStorage())
+    fake_supabase = types.ModuleType('supabase')
+    fake_supabase.create_client = lambda url, key: fake_client
+    fake_supabase.Client = object
+    monkeypatch.setitem(sys.modules, 'supabase', fake_supabase)
+    monkeypatch.delitem(sys.modules, 'app', raising=False)
+    return importlib.import_module('app')
+
+@pytest.fixture
+def client(app_module):
+    workbook = {
+        'Table p. 1': {
+            "sheet_name": 'Table p. 1',
+            "max_row": 1200,
+            "max_column": 120,
+            "cells": [
+                {"row": row, "column": col, "column_letter": chr(65 + (col - 1) % 26), "value": f"{row}:{col}"}
+                for row in range(1, 1201)
+                for col in (1, 49, 50, 51, 120)
+            ]
+        }
+    }
+    app_module.upload_cell_index('abc_report..v2', workbook)
+    return app_module.app.test_client()
+
+def get_cells(client, **params):
+    params.setdefault('id', 'abc_report..v2')
+    params.setdefault('sheet', 'Table p. 1')
+    return client.get('/api/cells', query_string=params)
+
+def test_window_returns_cells_across_column_tiles(client):
+    response = get_cells(client, row_start=10, row_count=2, col_start=49, col_count=3)
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert (body["row_start"], body["row_end"], body["col_start"], body["col_end"]) == (10, 11, 49, 51)
+    assert [(c["row"], c["column"]) for c in body["cells"]] == [
+        (10, 49), (10, 50), (10, 51), (11, 49), (11, 50), (11, 51)
+    ]
+    assert body["next_row_start"] == 12
+
+def test_window_is_capped_and_paginates(client):
+    first = get_cells(client, row_count=100000, col_count=100000).get_json()
+    assert first["row_end"] == 500
+    assert first["col_end"] == 100
+    assert first["next_row_start"] == 501
+
+    last = get_cells(client, row_start=1001, row_count=500).get_json()
+    assert last["row_end"] == 1200
+    assert last["next_row_start"] is None
+
+    past_end = get_cells(client, row_start=5000).get_json()
+    assert past_end["cells"] == []
+    assert past_end["next_row_start"] is None
+
+@pytest.mark.parametrize("params", [
+    {"row_start": "abc"},
+    {"col_count": "1.5"},
+    {"row_start": 0},
+    {"row_count": -1},
+])
+def test_invalid_window_bounds_are_rejected(client, params):
+    assert get_cells(client, **params).status_code == 400
+
+@pytest.mark.parametrize("params", [
+    {"id": ""},
+    {"id": "../other"},
+    {"sheet": ""},
+])
+def test_invalid_id_or_sheet_is_rejected(client, params):
+    assert get_cells(client, **params).status_code == 400
+
+def test_unknown_sheet_and_id_return_404(client):
+    assert get_cells(client, sheet='Missing').status_code == 404
+    assert get_cells(client, id='unknown').status_code == 404
+
+def test_storage_failure_is_not_reported_as_missing(client):
+    assert get_cells(client, id='broken').status_code == 500
@@ -0,0 +1,68 @@
+from cell_index import build_cell_index, tile_path, tiles_for_window, find_sheet, select_window
+
+def make_sheet(sheet_name, max_row, columns=(1, 3)):
+    """Build a sheet in the read_excel_for_llm output format with one cell per row and column"""
+    return {
+        "sheet_name": sheet_name,
+        "max_row": max_row,
+        "max_column": max(columns) if max_row else 0,
+        "cells": [
+            {"row": row, "column": col, "column_letter": chr(64 + col % 26), "value": f"{row}:{col}"}
+            for row in range(1, max_row + 1)
+            for col in columns
+        ]
+    }
+
+def test_window_spanning_row_tile_boundaries():
+    manifest, tiles = build_cell_index('ds', {'Sheet': make_sheet('Sheet', 600)}, tile_rows=200, tile_columns=50)
+    sheet = find_sheet(manifest, 'Sheet')
+
+    tile_keys = tiles_for_window(manifest, sheet, 190, 410, 1, 1)
+    assert tile_keys == [(0, 0), (1, 0), (2, 0)]
+
+    window = [tiles[tile_path('ds', 0, *key)] for key in tile_keys]
+    cells = select_window(window, 190, 410, 1, 1)
+    assert [c["row"] for c in cells] == list(range(190, 411))
+    assert all(c["column"] == 1 for c in cells)
+
+def test_narrow_window_on_wide_sheet_reads_only_overlapping_column_tiles():
+    wide = make_sheet('Wide', 10, columns=range(1, 5001))
+    manifest, tiles = build_cell_index('ds', {'Wide': wide}, tile_rows=200, tile_columns=50)
+    sheet = find_sheet(manifest, 'Wide')
+
+    assert len(sheet["tiles"]) == 100
+    tile_keys = tiles_for_window(manifest, sheet, 1, 10, 2491, 2510)
+    assert tile_keys == [(0, 49), (0, 50)]
+
+    window = [tiles[tile_path('ds', 0, *key)] for key in tile_keys]
+    cells = select_window(window, 1, 10, 2491, 2510)
+    assert len(cells) == 10 * 20
+    assert (cells[0]["row"], cells[0]["column"]) == (1, 2491)
+    assert (cells[-1]["row"], cells[-1]["column"]) == (10, 2510)
+
+def test_tiles_when_max_row_not_multiple_of_tile_size():
+    manifest, tiles = build_cell_index('ds', {'Sheet': make_sheet('Sheet', 450)}, tile_rows=200, tile_columns=50)
+
+    assert find_sheet(manifest, 'Sheet')["tiles"] == [[0, 0], [1, 0], [2, 0]]
+    last_tile = tiles[tile_path('ds', 0, 2, 0)]
+    assert last_tile["row_start"] == 401
+    assert [c["row"] for c in last_tile["cells"]][-1] == 450
+    assert sum(len(tile["cells"]) for tile in tiles.values()) == 450 * 2
+
+def test_sparse_tiles_are_not_stored():
+    sheet = make_sheet('Sparse', 0)
+    sheet.update(max_row=1000, max_column=200,
+                 cells=[{"row": 900, "column": 150, "column_letter": "T", "value": "x"}])
+    manifest, tiles = build_cell_index('ds', {'Sparse': sheet}, tile_rows=200, tile_columns=50)
+    entry = find_sheet(manifest, 'Sparse')
+
+    assert list(tiles) == [tile_path('ds', 0, 4, 2)]
+    assert tiles_for_window(manifest, entry, 1, 500, 1, 100) == []
+    assert tiles_for_window(manifest, entry, 800, 1000, 101, 200) == [(4, 2)]
+
+def test_empty_sheet_has_no_tiles():
+    manifest, tiles = build_cell_index('ds', {'Empty': make_sheet('Empty', 0)}, tile_rows=200, tile_columns=50)
+
+    assert find_sheet(manifest, 'Empty')["tiles"] == []
+    assert tiles == {}
+    assert find_sheet(manifest, 'Missing') is None
@@ -0,0 +1,80 @@
+from io import BytesIO
+import pandas as pd
+import pytest
+import excel_reader_for_llm
+from excel_reader_for_llm import available_engines, detect_excel_format, read_excel_for_llm, read_excel_sheets
+
+XLSX_HEADER = b'PK\x03\x04' + b'\x00' * 12
+XLS_HEADER = b'\xD0\xCF\x11\xE0\xA1\xB1\x1A\xE1' + b'\x00' * 8
+
+@pytest.mark.parametrize("content, expected", [
+    (XLSX_HEADER, 'xlsx'),
+    (XLS_HEADER, 'xls'),
+    (b'not an excel file', None),
+])
+def test_detect_excel_format_from_path(tmp_path, content, expected):
+    path = tmp_path / "input.xls"
+    path.write_bytes(content)
+    assert detect_excel_format(str(path)) == expected
+
+@pytest.mark.parametrize("content, expected", [
+    (XLSX_HEADER, 'xlsx'),
+    (XLS_HEADER, 'xls'),
+    (b'not an excel file', None),
+])
+def test_detect_excel_format_from_stream_preserves_position(content, expected):
+    stream = BytesIO(content)
+    stream.seek(3)
+    assert detect_excel_format(stream) == expected
+    assert stream.tell() == 3
+
+def test_available_engines_skips_missing_packages(monkeypatch):
+    monkeypatch.setattr(excel_reader_for_llm.importlib.util, 'find_spec',
+                        lambda name: None if name == 'python_calamine' else object())
+    assert available_engines('xls') == ['xlrd']
+    assert available_engines('xlsx') == ['openpyxl']
+
+def fake_read_excel(failing_engines, calls):
+    """Stand-in for pd.read_excel that fails for the given engines"""
+    def read_excel(file_input, sheet_name=None, engine=None):
+        calls.append((engine, file_input.tell()))
+        if engine in failing_engines:
+            file_input.read()  # Leave the stream at the end like a real failed parse
+            raise ValueError(f"{engine} cannot parse")
+        return {'Sheet1': pd.DataFrame([[1]])}
+    return read_excel
+
+def test_read_excel_sheets_falls_back_to_next_engine(monkeypatch):
+    calls = []
+    monkeypatch.setattr(excel_reader_for_llm.pd, 'read_excel', fake_read_excel({'calamine'}, calls))
+
+    sheets = read_excel_sheets(BytesIO(XLSX_HEADER), 'xlsx', engines=['calamine', 'openpyxl'])
+
+    assert list(sheets) == ['Sheet1']
+    # The stream is rewound before the fallback engine runs
+    assert calls == [('calamine', 0), ('openpyxl', 0)]
+
+def test_read_excel_sheets_reports_every_engine_error(monkeypatch):
+    calls = []
+    monkeypatch.setattr(excel_reader_for_llm.pd, 'read_excel', fake_read_excel({'calamine', 'xlrd'}, calls))
+
+    with pytest.raises(Exception) as excinfo:
+        read_excel_sheets(BytesIO(XLS_HEADER), 'xls', engines=['calamine', 'xlrd'])
+
+    message = str(excinfo.value)
+    assert 'calamine error: calamine cannot parse' in message
+    assert 'xlrd error: xlrd cannot parse' in message
+
+def test_read_excel_sheets_without_engines_raises():
+    with pytest.raises(Exception, match="No Excel engine installed"):
+        read_excel_sheets(BytesIO(XLS_HEADER), 'xls', engines=[])
+
+def test_read_excel_for_llm_parses_xlsx_stream():
+    stream = BytesIO()
+    pd.DataFrame({'A': ['x', None], 'B': [1, 2]}).to_excel(stream, index=False, sheet_name='Data', engine='openpyxl')
+    stream.seek(0)
+
+    data = read_excel_for_llm(stream)
+
+    assert data['Data']['max_row'] == 2
+    assert [cell['value'] for cell in data['Data']['cells']] == ['x', '1', '2']
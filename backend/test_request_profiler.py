@@ -0,0 +1,57 @@
+import json
+import os
+import pytest
+from flask import Flask, jsonify
+from request_profiler import RequestProfiler
+
+@pytest.fixture
+def profiled_app(tmp_path):
+    app = Flask(__name__)
+    profiler = RequestProfiler(app, output_dir=str(tmp_path), token='secret', max_profiles=2,
+                               endpoints=('work',))
+
+    @app.route('/work')
+    def work():
+        with profiler.stage('parse'):
+            data = [bytearray(1024) for _ in range(2048)]
+        with profiler.stage('render'):
+            total = len(data)
+        return jsonify({"total": total})
+
+    return app, profiler
+
+def test_flagged_request_saves_profile_with_stages(profiled_app):
+    app, profiler = profiled_app
+    response = app.test_client().get('/work', headers={'X-Profile-Token': 'secret'})
+
+    assert response.status_code == 200
+    profile_id = response.headers['X-Profile-Id']
+    assert os.path.exists(os.path.join(profiler.output_dir, f"{profile_id}.prof"))
+    with open(os.path.join(profiler.output_dir, f"{profile_id}.json"), encoding='utf-8') as f:
+        summary = json.load(f)
+
+    assert [stage["name"] for stage in summary["stages"]] == ['parse', 'render']
+    parse = summary["stages"][0]
+    # The parse stage allocated ~2 MiB, which the request-wide peak must include
+    assert parse["memory_peak_bytes"] >= 2 * 1024 * 1024
+    assert summary["memory_peak_bytes"] >= parse["memory_peak_bytes"]
+
+def test_unflagged_and_non_ascii_tokens_are_not_profiled(profiled_app):
+    app, profiler = profiled_app
+    client = app.test_client()
+
+    assert 'X-Profile-Id' not in client.get('/work').headers
+    response = client.get('/work', headers={'X-Profile-Token': 'tok\xe9'})
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+    assert profiler.list_profiles() == []
+
+def test_old_profiles_are_pruned(profiled_app):
+    app, profiler = profiled_app
+    client = app.test_client()
+
+    ids = [client.get('/work', headers={'X-Profile-Token': 'secret'}).headers['X-Profile-Id'] for _ in range(3)]
+
+    assert len(profiler.list_profiles()) == 2
+    assert len(os.listdir(profiler.output_dir)) == 4
+    assert profiler.list_profiles() == sorted(ids[1:], reverse=True)
@@ -69,10 +69,16 @@ export default function Dashboard() {
       // Generate charts from processed files
       const chartResponse = await axios.post('http://localhost:5000/api/generate-charts', {
         files: processedFiles,
-        scenarios: files.map(f => f.name.replace(/\.[^/.]+$/, ''))
+        scenarios: files.map(f => f.name.replace(/\.[^/.]+$/, '')),
+        // Get the chart images inline and let the backend persist them in the background
+        direct: true,
+        persist: true
       });
 
-      setChartUrls(chartResponse.data.chart_urls);
+      // Direct mode returns base64 PNGs; show them as data URIs
+      setChartUrls(chartResponse.data.charts.map(
+        (chart: { content_type: string; data: string }) => `data:${chart.content_type};base64,${chart.data}`
+      ));
     } catch (err) {
       console.error(err);
       setError('Error processing files');